@@ -1,42 +1,204 @@
 import subprocess
 import os
+import csv
+import re
 import time
+import socket
+import threading
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import http.client
+import json
+from urllib.parse import urlencode
 from enum import Enum
 import logging
 from contextlib import contextmanager
-from typing import Dict, Union, Callable
+from typing import Dict, Union, Callable, Iterable, List, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Keeps console windows from flashing up for the command line tools on Windows
+_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+# The remote utility and tasklist are console programs, which write in the OEM code page on Windows
+_CONSOLE_ENCODING = "oem" if os.name == "nt" else "utf-8"
+# Replies of the web server are UTF-8
+_WEBSERVER_ENCODING = "utf-8"
+# Parameters that change without being set, so their values are never cached
+_NOCACHE = frozenset({"lastcaptured", "session.counter"})
+# Read before and after a capture; the counter tells shots apart even when the file name doesn't change
+_CAPTURE_STATE = ["get lastcaptured", "get session.counter"]
 
 
 class CommandError(Exception):
     pass
 
+class SettingsError(CommandError):
+    '''
+    Raised by expose when settings were rejected. The capture has been attempted anyway.
+    :ivar failed: The attribute names of the rejected settings.
+    :ivar last_captured: The file captured without them, or None if the capture failed too.
+    '''
+    def __init__(self, failed: List[str], last_captured: str = None):
+        outcome = f"{last_captured} was captured without the requested settings" if last_captured else "the capture failed too"
+        super().__init__(f"Could not set {', '.join(failed)}; {outcome}.")
+        self.failed = failed
+        self.last_captured = last_captured
+
+# Enum for the outcome of a command
+class Status(Enum):
+    OK = "ok"
+    ERROR = "error"
+    EMPTY = "empty"
+
+# Matches one command's output in a batched call: from a 'response:' or 'error:' token up to the line holding the next one
+_CHUNK_RE = re.compile(r'(?:response|error):.*?(?=\r?\n[^\w\r\n]*(?:response|error):|\Z)', re.DOTALL)
+# The token a response starts with, which may only be preceded by punctuation such as ':;', and what follows it
+_RESPONSE_RE = re.compile(r'^[^\w\r\n]*(?P<status>response|error):(?P<payload>.*)', re.DOTALL | re.MULTILINE)
+# Message of an error response
+_MESSAGE_RE = re.compile(r'message:(?P<message>.*)', re.DOTALL)
+# Characters around and between the items of a list response
+_LIST_DELETE = str.maketrans("", "", '"[];\r\n')
+
+def _parse(response: str) -> Tuple[Status, str]:
+    '''
+    Parses a response of the remote utility.
+    :return: (Status.OK, payload), (Status.ERROR, error message), or (Status.EMPTY, "") if there is no response,
+             e.g. because the command could not be executed.
+    '''
+    # The status is taken from the token only, as payloads such as file paths may contain the word 'error'
+    match = _RESPONSE_RE.search(response)
+    if match is None:
+        return Status.EMPTY, ""
+    payload = match.group('payload')
+    if match.group('status') == 'error':
+        message = _MESSAGE_RE.search(payload)
+        return Status.ERROR, (message.group('message') if message else payload).strip('\r\n')
+    return Status.OK, payload.strip('";\r\n')
+
+def _split_responses(output: str, count: int) -> List[str]:
+    '''
+    Splits the output of a batched remote utility call into the responses of its commands.
+    :return: count responses, padded with empty strings if the utility stopped early.
+    '''
+    chunks = _CHUNK_RE.findall(output)[:count]
+    return chunks + [""] * (count - len(chunks))
+
+def _parse_webserver(body: str) -> Tuple[Status, Union[str, List[str]]]:
+    '''
+    Parses a reply of the web server's slc handler, which is the JSON encoded value,
+    OK for commands without a value, or the text of the error.
+    :return: Like _parse, except that the payload of a list is the list of its items.
+    '''
+    body = body.strip()
+    if not body:
+        return Status.EMPTY, ""
+    if body == "OK":
+        return Status.OK, ""
+    try:
+        value = json.loads(body)
+    except ValueError:
+        # Not a JSON value, so it is an error message
+        return Status.ERROR, body
+    if isinstance(value, list):
+        return Status.OK, [_text(item) for item in value]
+    return Status.OK, "" if value is None else _text(value)
+
 # Enum for Transfer Modes
 class TransferMode(Enum):
     PC = "Save_to_PC_only"
     CAMERA = "Save_to_camera_only"
     BOTH = "Save_to_PC_and_camera"
 
+def _text(value) -> str:
+    # Most values are strings already, so only convert the others
+    return value if type(value) is str else str(value)
+
+# Descriptors for the camera settings
+class _RemoteParam:
+    '''
+    Camera attribute that gets and sets a digiCamControl parameter.
+    '''
+    def __init__(self, name: str, doc: str = None):
+        self.name = name
+        self.__doc__ = doc
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance._get(self.name)
+
+    def __set__(self, instance, value):
+        instance._set(self.name, value)
+
+class _RemoteListParam:
+    '''
+    Camera attribute listing the supported values of a digiCamControl parameter.
+    The supported values of a camera never change, so the list is cached on the instance once it was read successfully.
+    '''
+    def __init__(self, name: str):
+        self.name = name
+
+    def __set_name__(self, owner, attr):
+        self.attr = attr
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance._list(self.name)
+        if value is None:
+            # Not cached, so the list is read again once the camera can answer
+            return []
+        # Stored under the attribute's own name, so later lookups find it in the instance dict
+        instance.__dict__[self.attr] = value
+        return value
+
 # Main Camera Class
 class Camera:
     '''
     Class to control the camera using digiCamControl software
     '''
+    # Time at which each process was last seen running, shared by all instances
+    _last_seen_running: Dict[str, float] = {}
+
     def __init__(self, 
                  digicamcontrol_path: str = "C:\\Program Files (x86)\\digiCamControl", 
                  timeout: int = 5, 
-                 AutoFocus: bool = True):
-        from pathlib import Path
-        self.app_path = str(Path(digicamcontrol_path) / "CameraControl.exe")
-        self.remote_utility = str(Path(digicamcontrol_path) / "CameraControlRemoteCmd.exe")
-        logging.basicConfig(level=logging.INFO)
+                 AutoFocus: bool = True,
+                 cache_values: bool = True,
+                 webserver_port: int = None,
+                 capture_timeout: float = 10):
+        self.app_path = os.path.join(digicamcontrol_path, "CameraControl.exe")
+        self.remote_utility = os.path.join(digicamcontrol_path, "CameraControlRemoteCmd.exe")
         
         self.timeout = timeout
+        self.capture_timeout = capture_timeout
         self.callbacks = {}
         self.inLiveViewMode:bool = False
         self.AutoFocus:bool = AutoFocus
-
-        if not os.path.exists(self.app_path):
-            raise ValueError(f"Invalid CameraControl application path: {self.digicamcontrol_path}")
+        # Last known value of each setting, so repeated reads don't hit the remote utility
+        self._value_cache: Dict[str, str] = {}
+        self._cache_enabled: bool = cache_values
+        # With a port given (digiCamControl's default is 5513), commands go to its web server over one kept-alive
+        # connection instead of launching the remote utility for every command
+        self.webserver_port = webserver_port
+        self._connection: Union[http.client.HTTPConnection, None] = None
+        self._webserver_available: bool = True
+        self._lock = threading.Lock()
+        # A capture is several commands (read the last file, capture, poll for the new file), so overlapping
+        # captures would see each other's files; this lock makes them run one after the other
+        self._capture_lock = threading.Lock()
+        # Runs the *_async methods; captures can't overlap anyway, so one worker is enough
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+        if not os.path.isfile(self.app_path):
+            raise ValueError(f"Invalid CameraControl application path: {digicamcontrol_path}")
+        # Logged once here, so the per-command log only needs the command itself
+        logger.info("Using remote utility %s", self.remote_utility)
 
         if not self._is_running("CameraControl.exe"):
             self._start_app()
@@ -46,164 +208,192 @@ class Camera:
         self.callbacks[event_name] = callback
 
     def _is_running(self, process_name: str) -> bool:
-        try:
-            output = subprocess.check_output('tasklist', shell=True).decode()
-            return process_name in output
-        except subprocess.CalledProcessError:
-            logging.error("Error checking running tasks.")
-            return False
+        # Trust a recent positive result instead of scanning the process list again
+        last_seen = Camera._last_seen_running.get(process_name)
+        if last_seen is not None and time.monotonic() - last_seen < self.timeout:
+            return True
+
+        if psutil is not None:
+            running = any(p.info['name'] == process_name for p in psutil.process_iter(['name']))
+        else:
+            try:
+                # One quoted row per process, image name first
+                output = subprocess.check_output(['tasklist', '/FO', 'CSV', '/NH'], creationflags=_NO_WINDOW).decode(_CONSOLE_ENCODING, "replace")
+                running = any(row and row[0] == process_name for row in csv.reader(output.splitlines()))
+            except subprocess.CalledProcessError:
+                logger.error("Error checking running tasks.")
+                return False
+
+        if running:
+            Camera._last_seen_running[process_name] = time.monotonic()
+        return running
 
     def _start_app(self):
         try:
             subprocess.Popen([self.app_path])
-            time.sleep(self.timeout)
         except Exception as e:
-            logging.error(f"Error starting CameraControl application: {e}")
-
-    def _execute(self, command):
-        cmd = [self.remote_utility, "/c", command]
+            logger.error(f"Error starting CameraControl application: {e}")
+            return
+
+        deadline = time.monotonic() + self.timeout
+        if self.webserver_port is None:
+            # The app is ready once its process is up and it answers the remote utility
+            while time.monotonic() < deadline:
+                if self._is_running("CameraControl.exe") and self._execute("get session.name")[0] == Status.OK:
+                    return
+                time.sleep(0.25)
+            return
+
+        # The app is ready once its web server accepts connections; without the web server this waits the full timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.webserver_port), timeout=0.1).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+
+    def _request(self, command):
+        """
+        Sends a command to the digiCamControl web server over the kept-alive connection.
+        :return: The parsed response (see _parse_webserver), None if the web server can't be reached,
+                 or (Status.EMPTY, "") if the command was sent but no reply was received.
+        """
+        if self.webserver_port is None or not self._webserver_available:
+            return None
+        command_type, _, params = command.partition(" ")
+        param1, _, param2 = params.partition(" ")
+        url = "/?" + urlencode({"slc": command_type, "param1": param1, "param2": param2})
+        while True:
+            reused = self._connection is not None
+            if not reused and not self._connect():
+                return None
+            try:
+                self._connection.request("GET", url)
+                raw = self._connection.getresponse().read()
+            except http.client.RemoteDisconnected as e:
+                self._disconnect()
+                # The server dropped the idle kept-alive connection without replying, so send again on a fresh one
+                if reused:
+                    continue
+                logger.error(f"digiCamControl web server closed the connection without replying to {command}: {e}")
+                return Status.EMPTY, ""
+            except (OSError, http.client.HTTPException) as e:
+                # The command may have been executed (e.g. a long exposure that outlasts the timeout),
+                # so it is never sent again
+                self._disconnect()
+                logger.error(f"No reply from digiCamControl web server to {command}: {e}")
+                return Status.EMPTY, ""
+            try:
+                body = raw.decode(_WEBSERVER_ENCODING)
+            except UnicodeDecodeError as e:
+                logger.error(f"Could not decode the reply of digiCamControl web server to {command}: {e}: {raw!r}")
+                return Status.EMPTY, ""
+            self._log_result(command, body)
+            return _parse_webserver(body)
+
+    def _connect(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.webserver_port, timeout=self.timeout)
         try:
-            result = subprocess.check_output(cmd).decode()
-            logging.info(f"Command Execution Details:\n"
-                        f"---------------------------\n"
-                        f"Command: {' '.join(cmd)}\n"
-                        f"Result: \n{result}"
-                        f"---------------------------")
-            return result
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Error executing command: {cmd}. Error: {e}")
-            return ""
-            raise
-
-    @property
-    def ShutterSpeeds(self):
-        return self._list("shutterspeed")
-
-    @property
-    def ShutterSpeed(self):
-        return self._get("shutterspeed")
-
-    @ShutterSpeed.setter
-    def ShutterSpeed(self, value):
-        self._set("shutterspeed", value)
-
-    @property
-    def ISOs(self):
-        # Assume 'list iso' returns list of ISOs
-        return self._list("iso")
-
-    @property
-    def ISO(self):
-        return self._get("iso")
-
-    @ISO.setter
-    def ISO(self, value):
-        self._set("iso", value)
-
-    @property
-    def ExposureComps(self):
-        return self._list("exposurecompensation")
-
-    @property
-    def ExposureComp(self):
-        return self._get("exposurecompensation")
-
-    @ExposureComp.setter
-    def ExposureComp(self, value):
-        self._set("exposurecompensation", value)
-
-    @property
-    def Apertures(self):
-        return self._list("aperture")
-
-    @property
-    def Aperture(self):
-        return self._get("aperture")
-
-    @Aperture.setter
-    def Aperture(self, value):
-        self._set("aperture", value)
-
-    @property
-    def FocusModes(self):
-        return self._list("focusmode")
-
-    @property
-    def FocusMode(self):
-        return self._get("focusmode")
-
-    @FocusMode.setter
-    def FocusMode(self, value):
-        self._set("focusmode", value)
-
-    @property
-    def WhiteBalances(self):
-        return self._list("whitebalance")
-
-    @property
-    def WhiteBalance(self):
-        return self._get("whitebalance")
-
-    @WhiteBalance.setter
-    def WhiteBalance(self, value):
-        self._set("whitebalance", value)
-
-    @property
-    def Modes(self):
-        return self._list("mode")
-
-    @property
-    def Mode(self):
-        return self._get("mode")
-
-    @Mode.setter
-    def Mode(self, value):
-        self._set("mode", value)
-
-    @property
-    def Compressions(self):
-        return self._list("compressionsetting")
-
-    @property
-    def Compression(self):
-        return self._get("compressionsetting")
-
-    @Compression.setter
-    def Compression(self, value):
-        self._set("compressionsetting", value)
-
-    @property
-    def Session(self):
-        return self._get("session.name")
-
-    @Session.setter
-    def Session(self, value):
-        self._set("session.name", value)
-
-    @property
-    def Folder(self):
-        return self._get("session.folder")
+            connection.connect()
+        except OSError as e:
+            logger.warning(f"digiCamControl web server is not reachable, using the remote utility instead: {e}")
+            self._webserver_available = False
+            return False
+        self._connection = connection
+        return True
 
-    @Folder.setter
-    def Folder(self, value):
-        self._set("session.folder", value)
+    def _disconnect(self):
+        self._connection.close()
+        self._connection = None
 
-    @property
-    def Counter(self):
-        return self._get("session.counter")
+    def _log_result(self, command, result):
+        # Skip building the message entirely unless it will be logged
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("slc> %s\n%s", command, result)
 
-    @Counter.setter
-    def Counter(self, value):
-        self._set("session.counter", value)
+    def _run_utility(self, commands: List[str]) -> str:
+        """
+        Launches the remote utility once for the given commands.
+        :return: The combined output of the commands, or an empty string if the utility failed.
+        """
+        cmd = [self.remote_utility]
+        for command in commands:
+            cmd += ["/c", command]
+        completed = subprocess.run(cmd, capture_output=True, check=False, creationflags=_NO_WINDOW)
+        if completed.returncode != 0:
+            logger.error(f"Error executing command: {cmd}. Exit code {completed.returncode}: "
+                         f"{completed.stderr.decode(_CONSOLE_ENCODING, 'replace').strip()}")
+            return ""
+        # Decoded strictly, as responses hold file paths that must not be altered
+        try:
+            result = completed.stdout.decode(_CONSOLE_ENCODING)
+        except UnicodeDecodeError as e:
+            logger.error(f"Could not decode the output of command: {cmd}: {e}: {completed.stdout!r}")
+            return ""
+        self._log_result("; ".join(commands), result)
+        return result
+
+    def _execute(self, command) -> Tuple[Status, Union[str, List[str]]]:
+        # Commands are serialized, as they share the web server connection
+        with self._lock:
+            result = self._request(command)
+            if result is None:
+                return _parse(self._run_utility([command]))
+            return result
 
-    @property
-    def FileNameTemplate(self):
-        return self._get("session.filenametemplate")
-    
-    @FileNameTemplate.setter
-    def FileNameTemplate(self, value):
+    def _execute_many(self, commands: Iterable[str]) -> List[Tuple[Status, Union[str, List[str]]]]:
         """
-        Set the file name template. The template can include the following placeholders:
+        Executes several commands with a single call to the remote utility.
+        :param commands: The commands to execute, in order.
+        :return: The parsed response of each command, in the same order.
+                 Missing responses are returned as (Status.EMPTY, "").
+        """
+        commands = list(commands)
+        responses = []
+        with self._lock:
+            # The web server takes one command per request, but all of them reuse the kept-alive connection
+            for command in commands:
+                result = self._request(command)
+                if result is None:
+                    break
+                responses.append(result)
+
+            # Whatever the web server didn't handle goes to a single remote utility call
+            remaining = commands[len(responses):]
+            if remaining:
+                output = self._run_utility(remaining)
+                responses += [_parse(chunk) for chunk in _split_responses(output, len(remaining))]
+        return responses
+
+    ShutterSpeeds = _RemoteListParam("shutterspeed")
+    ShutterSpeed = _RemoteParam("shutterspeed")
+
+    ISOs = _RemoteListParam("iso")
+    ISO = _RemoteParam("iso")
+
+    ExposureComps = _RemoteListParam("exposurecompensation")
+    ExposureComp = _RemoteParam("exposurecompensation")
+
+    Apertures = _RemoteListParam("aperture")
+    Aperture = _RemoteParam("aperture")
+
+    FocusModes = _RemoteListParam("focusmode")
+    FocusMode = _RemoteParam("focusmode")
+
+    WhiteBalances = _RemoteListParam("whitebalance")
+    WhiteBalance = _RemoteParam("whitebalance")
+
+    Modes = _RemoteListParam("mode")
+    Mode = _RemoteParam("mode")
+
+    Compressions = _RemoteListParam("compressionsetting")
+    Compression = _RemoteParam("compressionsetting")
+
+    Session = _RemoteParam("session.name")
+    Folder = _RemoteParam("session.folder")
+    Counter = _RemoteParam("session.counter")
+    FileNameTemplate = _RemoteParam("session.filenametemplate", doc="""
+        The file name template. The template can include the following placeholders:
         - [Counter x digit]: The session counter value with total length of X character filled with leading 0
         - [Camera Counter X digit]: The capture camera counter value with total length of X character filled with leading 0
         - [Session Name]: The name of the current session
@@ -212,21 +402,16 @@ class Camera:
         - [File format]: File format of the captured file, jpg or raw
         - [Barcode]: The barcode value scanned in Barcode window
         - [Camera Name]: The camera name set in Camera property window
-        Folders can also be defined using backslash \ character. Ex: [Date yyyy-MM-dd]\[Date yyyy-MM-dd-hh-mm-ss]
-        """
-        self._set("session.filenametemplate", value)
-
-    @property
-    def DeleteFileAfterTransfer(self):
-        return self._get("session.deletefileaftertransfer")
-
-    @DeleteFileAfterTransfer.setter
-    def DeleteFileAfterTransfer(self, value: bool):
-        self._set("session.deletefileaftertransfer", value)
+        Folders can also be defined using backslash \\ character. Ex: [Date yyyy-MM-dd]\\[Date yyyy-MM-dd-hh-mm-ss]
+        """)
+    DeleteFileAfterTransfer = _RemoteParam("session.deletefileaftertransfer")
 
     @property
     def Transfer(self):
         mode = self._get("transfer")
+        # Like the other settings, None if it could not be read
+        if mode is None:
+            return None
         return TransferMode(mode.replace(' ', '_'))
 
     @Transfer.setter
@@ -235,65 +420,105 @@ class Camera:
 
     @property
     def LastCaptured(self):
-        response = self._execute("get lastcaptured")
-        if 'error' in response:
-            error_message = response.split('message:')[1].strip('\r\n')
-            logging.error(f"Error executing get lastcaptured command: {error_message}")
-            return None
-        value = response.split('response:')[1].strip('";\r\n')
-        return value
+        return self._get("lastcaptured")
+
+    def invalidate_lists(self):
+        """
+        Clears the cached lists of supported values, e.g. after connecting a different camera.
+        """
+        for name in list(self.__dict__):
+            if isinstance(getattr(type(self), name, None), _RemoteListParam):
+                del self.__dict__[name]
+
+    def refresh(self):
+        """
+        Clears the cached setting values, e.g. after a dial was turned on the camera itself.
+        """
+        self._value_cache.clear()
+
+    def read_all(self, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Reads several settings with a single call to the remote utility.
+        Settings whose value is already cached are not read again.
+        :param names: The settings to read, by attribute name, e.g. ['ISO', 'Aperture', 'ShutterSpeed'].
+        :return: A dict mapping each name to its value, or None if it could not be read.
+        """
+        params = {name: self._setting(name).name for name in names}
+        values = {param: self._value_cache[param] for param in params.values()
+                  if self._cacheable(param) and param in self._value_cache}
+        missing = [param for param in dict.fromkeys(params.values()) if param not in values]
+        if missing:
+            responses = self._execute_many(f"get {param}" for param in missing)
+            for param, response in zip(missing, responses):
+                values[param] = self._value(response, "get")
+                if self._cacheable(param) and values[param] is not None:
+                    self._value_cache[param] = values[param]
+        return {name: values[param] for name, param in params.items()}
+
+    def _setting(self, name) -> _RemoteParam:
+        descriptor = getattr(type(self), name, None)
+        if not isinstance(descriptor, _RemoteParam):
+            raise ValueError(f"Invalid camera setting: {name}")
+        return descriptor
 
     # Common methods to get value, set value and get list
+    def _value(self, response, command_type):
+        status, payload = response
+        match status:
+            case Status.OK:
+                # If there is no error, the payload is the value
+                return payload
+            case Status.ERROR:
+                logger.error(f"Error executing {command_type} command: {payload}")
+                return None
+            case Status.EMPTY:
+                logger.error(f"No response to {command_type} command.")
+                return None
+
+    def _cacheable(self, param):
+        return self._cache_enabled and param not in _NOCACHE
+
     def _get(self, param):
-        # Execute the get command and get the response
-        response = self._execute(f"get {param}")
-        
-        # Check if the response contains an error
-        if 'error' in response:
-            # Extract the error message and log it
-            error_message = response.split('message:')[1].strip('\r\n')
-            logging.error(f"Error executing get command: {error_message}")
-            return None
-        
-        # If there is no error, extract the value from the response
-        value = response.split('response:')[1].strip('";\r\n')
-        
-        # Return the value
+        # Return the cached value if there is one
+        if self._cacheable(param) and param in self._value_cache:
+            return self._value_cache[param]
+
+        # Execute the get command and extract the value from the response
+        value = self._value(self._execute(f"get {param}"), "get")
+        if self._cacheable(param) and value is not None:
+            self._value_cache[param] = value
         return value
 
     def _set(self, param, value):
-        # Execute the set command and get the response
-        response = self._execute(f"set {param} {value}")
-        
-        # Check if the response contains an error
-        if 'error' in response:
-            # Extract the error message and log it
-            error_message = response.split('message:')[1].strip('\r\n')
-            logging.error(f"Error executing set command: {error_message}")
-            return None
-        
-        # If there is no error, extract the value from the response
-        value = response.split('response:')[1].strip('";\r\n')
-        
-        # Return the value
-        return value
+        value = _text(value)
+
+        # Execute the set command and extract the value from the response
+        result = self._value(self._execute("set " + param + " " + value), "set")
+        self._store(param, value, result)
+        return result
+
+    def _store(self, param, value, result):
+        # Remember the new value, or forget the old one if the camera rejected it
+        if result is None:
+            self._value_cache.pop(param, None)
+        elif self._cacheable(param):
+            self._value_cache[param] = value
 
     def _list(self, param):
         # Execute the list command and get the response
-        response = self._execute(f"list {param}")
-        
-        # Check if the response contains an error
-        if 'error' in response:
-            # Extract the error message and log it
-            error_message = response.split('message:')[1].strip('\r\n')
-            logging.error(f"Error executing list command: {error_message}")
-            return []
-        
-        # If there is no error, extract the list from the response
-        response_list = response.split('response:')[1].strip('[];\r\n').replace('"','').split(',')
-        
-        # Return the list
-        return response_list
+        status, payload = self._execute(f"list {param}")
+        match status:
+            case Status.OK if isinstance(payload, list):
+                return payload
+            case Status.OK:
+                # Extract the list from the payload
+                return [item for item in payload.translate(_LIST_DELETE).split(',') if item]
+            case Status.ERROR:
+                logger.error(f"Error executing list command: {payload}")
+                return None
+            case Status.EMPTY:
+                logger.error("No response to list command.")
+                return None
         
     def singleLineCommand(self, command_type:str):
         """ Not used yet ! ref:https://github.com/dukus/digiCamControl/blob/5785e2b3ec29de153ad894e3b925ddeddb4ef76e/CameraControl.Application/WebServer/browse.html#L29
@@ -302,11 +527,10 @@ class Camera:
         """
         valid_commands = ['get', 'set', 'list', 'capture', 'do']
         if command_type not in valid_commands:
-            logging.error(f"Invalid command type: {command_type}. Valid commands are {valid_commands}.")
+            logger.error(f"Invalid command type: {command_type}. Valid commands are {valid_commands}.")
             return None
         else:
-            response = self._execute(command_type)
-            return response
+            return self._value(self._execute(command_type), command_type)
 
     def startLiveView(self):
         """
@@ -332,27 +556,122 @@ class Camera:
         if self.inLiveViewMode:
             self._execute("do LiveView_Focus")
         else:
-            logging.error("Error: Camera is not in live view mode. Cannot execute focus command.")
+            logger.error("Error: Camera is not in live view mode. Cannot execute focus command.")
             # raise CommandError("Camera is not in live view mode. Cannot execute focus command.")
 
     def capture(self, location:str=None):
         """
         Captures an image. If the camera is in live view mode, it will use the live view capture command.
         If a location is provided, it will be appended to the command.
+        Waits up to capture_timeout seconds for the captured file to be reported.
+        :param location: The location where the image will be saved.
+        :return: The last captured file, or None if the capture failed.
+        """
+        with self._capture_lock:
+            previous = self._read_capture_state()
+            status, payload = self._execute(self._capture_command(location))
+            match status:
+                case Status.OK:
+                    return self._wait_for_capture(previous)
+                case Status.ERROR:
+                    logger.error(f"Error executing capture command: {payload}")
+                    return None
+                case Status.EMPTY:
+                    logger.error("No response to capture command.")
+                    return None
+
+    def expose(self, location: str = None, **settings):
+        """
+        Applies the given settings, captures an image and reads the captured file, all in one batch of commands.
         :param location: The location where the image will be saved.
+        :param settings: Settings to apply before the capture, by attribute name, e.g. ISO="100", ShutterSpeed="1/200".
+        :return: The last captured file, or None if the capture failed.
+        :raises SettingsError: If a setting was rejected. The commands are sent as one batch, so the capture
+                               has been attempted anyway, without that setting; the error's failed and
+                               last_captured attributes tell which settings and which file.
         """
+        params = {self._setting(name).name: _text(value) for name, value in settings.items()}
+
+        # The capture state is read first, to tell whether the new file is reported yet at the end of the batch
+        commands = list(_CAPTURE_STATE)
+        commands += ["set " + param + " " + value for param, value in params.items()]
+        commands += [self._capture_command(location)] + _CAPTURE_STATE
+        with self._capture_lock:
+            responses = self._execute_many(commands)
+
+            previous = self._capture_state(responses[:len(_CAPTURE_STATE)])
+            failed = []
+            for name, (param, value), response in zip(settings, params.items(), responses[len(_CAPTURE_STATE):]):
+                result = self._value(response, "set")
+                self._store(param, value, result)
+                if result is None:
+                    failed.append(name)
+
+            status, payload = responses[-len(_CAPTURE_STATE) - 1]
+            match status:
+                case Status.OK:
+                    state = self._capture_state(responses[-len(_CAPTURE_STATE):])
+                    last_captured = state[0]
+                    if not last_captured or state == previous:
+                        last_captured = self._wait_for_capture(previous)
+                case Status.ERROR:
+                    logger.error(f"Error executing capture command: {payload}")
+                    last_captured = None
+                case Status.EMPTY:
+                    logger.error("No response to capture command.")
+                    last_captured = None
+
+        if failed:
+            raise SettingsError(failed, last_captured)
+        return last_captured
+
+    def _capture_command(self, location):
         capturecmd = "Capture" if self.AutoFocus else "CaptureNoAf"
         command = "do LiveView_Capture" if self.inLiveViewMode else capturecmd
         if location:
             command += f" {location}"
-        response = self._execute(command)
-        if 'error' in response:
-            error_message = response.split('message:')[1].strip('\r\n')
-            logging.error(f"Error executing capture command: {error_message}")
-            return None
-        else:
-            time.sleep(1)
-            return self.LastCaptured
+        return command
+
+    def _capture_state(self, responses) -> Tuple:
+        # The file name alone may repeat (fixed folder and template), so the counter and, if the file
+        # is local, its modification time are compared as well
+        last_captured, counter = (self._value(response, "get") for response in responses)
+        try:
+            mtime = os.path.getmtime(last_captured) if last_captured else None
+        except OSError:
+            mtime = None
+        return last_captured, counter, mtime
+
+    def _read_capture_state(self) -> Tuple:
+        return self._capture_state(self._execute_many(_CAPTURE_STATE))
+
+    def _wait_for_capture(self, previous):
+        # Wait for the new file to be reported rather than for a fixed time
+        state = previous
+        deadline = time.monotonic() + self.capture_timeout
+        while time.monotonic() < deadline:
+            state = self._read_capture_state()
+            if state[0] and state != previous:
+                return state[0]
+            time.sleep(0.025)
+        logger.warning(f"No new capture reported within {self.capture_timeout} seconds.")
+        return state[0]
+
+    def capture_async(self, location: str = None) -> Future:
+        """
+        Captures an image in the background, so the caller can e.g. process the previous image meanwhile.
+        :param location: The location where the image will be saved.
+        :return: A Future resolving to the result of capture.
+        """
+        return self._pool.submit(self.capture, location)
+
+    async def acapture(self, location: str = None):
+        """
+        Captures an image without blocking the asyncio event loop.
+        :param location: The location where the image will be saved.
+        :return: The result of capture.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self.capture, location)
 
     def startRecording(self):
         """
@@ -361,20 +680,19 @@ class Camera:
         Some cameras may not support video recording unless in live view mode.
         """
         command = "do LiveViewWnd_StartRecord" if self.inLiveViewMode else "do StartRecord"
-        response = self._execute(command)
+        status, response_text = self._execute(command)
 
-        # extract the response from the command execution
-        response_text = response.split('response:')[1].strip('";\r\n')
-
-        # check if the response text is empty, indicating a successful command execution
-        if response_text == "":
-            # if the response text is empty, return True to indicate that the recording started
-            return True
-        else:
-            # if the response text is not empty, it contains an error message
-            logging.error(f"Error starting video recording: {response_text}")
-            # return False to indicate that the recording did not start
-            return False
+        match status:
+            # an empty response text indicates a successful command execution
+            case Status.OK if response_text == "":
+                return True
+            # otherwise the response text contains an error message
+            case Status.OK | Status.ERROR:
+                logger.error(f"Error starting video recording: {response_text}")
+                return False
+            case Status.EMPTY:
+                logger.error("No response to start recording command.")
+                return False
 
 
     def stopRecording(self):
@@ -396,6 +714,24 @@ class Camera:
         Closes all windows and quits digiCamControl application.
         """
         self._execute("do All_Close")
+        self.close()
+
+    def close(self):
+        """
+        Closes the connection to the digiCamControl web server and stops the background captures.
+        """
+        self._pool.shutdown(wait=False)
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __del__(self):
+        # __init__ may have failed before these attributes were set
+        if getattr(self, "_pool", None) is not None:
+            self._pool.shutdown(wait=False)
+        if getattr(self, "_connection", None) is not None:
+            self._connection.close()
 
     @contextmanager
     def liveView(self):
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# core.py lives at the repository root rather than in an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
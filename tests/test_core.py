@@ -0,0 +1,126 @@
+import subprocess
+import time
+
+import pytest
+
+import core
+from core import Status
+
+# Sample output in the format of CameraControlRemoteCmd.exe, three commands batched in one call
+BATCH_OUTPUT = (
+    ':;response:"100";\r\n'
+    ':;error:;message:Unknown parameter bogus\r\n'
+    ':;response:C:\\errors\\a.jpg;\r\n'
+)
+
+
+class FakeUtility:
+    '''
+    Stands in for subprocess.run, answering each /c command in the remote utility's output format.
+    Captures keep reporting the same file name, as with a fixed folder and file name template.
+    '''
+    def __init__(self, values):
+        self.values = dict(values)
+        self.calls = []
+
+    def __call__(self, cmd, **kwargs):
+        commands = cmd[2::2]
+        self.calls.append(commands)
+        stdout = "".join(self.respond(command) for command in commands).encode()
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr=b"")
+
+    def respond(self, command):
+        verb, _, rest = command.partition(" ")
+        param, _, value = rest.partition(" ")
+        if verb in ("Capture", "CaptureNoAf"):
+            self.values["session.counter"] = str(int(self.values["session.counter"]) + 1)
+            return ':;response:;\r\n'
+        if param not in self.values:
+            return f':;error:;message:Unknown parameter {param}\r\n'
+        if verb == "set":
+            self.values[param] = value
+        if verb == "list":
+            return ':;response:["100","200","400"];\r\n'
+        return f':;response:"{self.values[param]}";\r\n'
+
+
+@pytest.fixture
+def utility(monkeypatch):
+    fake = FakeUtility({"iso": "100", "aperture": "5.6", "lastcaptured": "C:\\images\\shot.jpg",
+                        "session.counter": "1"})
+    monkeypatch.setattr(core.subprocess, "run", fake)
+    return fake
+
+
+@pytest.fixture
+def camera(tmp_path, monkeypatch, utility):
+    (tmp_path / "CameraControl.exe").touch()
+    monkeypatch.setattr(core.Camera, "_is_running", lambda self, process_name: True)
+    camera = core.Camera(str(tmp_path), capture_timeout=2)
+    yield camera
+    camera.close()
+
+
+def test_split_responses():
+    assert core._split_responses(BATCH_OUTPUT, 3) == [
+        'response:"100";',
+        'error:;message:Unknown parameter bogus',
+        'response:C:\\errors\\a.jpg;\r\n',
+    ]
+
+
+def test_split_responses_pads_missing():
+    assert core._split_responses(':;response:"100";\r\n', 3) == ['response:"100";\r\n', "", ""]
+
+
+@pytest.mark.parametrize("response, expected", [
+    (':;response:"100";\r\n', (Status.OK, "100")),
+    (':;response:;\r\n', (Status.OK, "")),
+    (':;response:C:\\errors\\a.jpg;', (Status.OK, "C:\\errors\\a.jpg")),
+    (':;error:;message:Unknown parameter bogus\r\n', (Status.ERROR, "Unknown parameter bogus")),
+    ('', (Status.EMPTY, "")),
+])
+def test_parse(response, expected):
+    assert core._parse(response) == expected
+
+
+@pytest.mark.parametrize("body, expected", [
+    ('"C:\\\\images\\\\a.jpg"', (Status.OK, "C:\\images\\a.jpg")),
+    ('"caf\\u00e9.jpg"', (Status.OK, "café.jpg")),
+    ('["1/100","2,5"]', (Status.OK, ["1/100", "2,5"])),
+    ('OK', (Status.OK, "")),
+    ('Unknown parameter bogus', (Status.ERROR, "Unknown parameter bogus")),
+    ('', (Status.EMPTY, "")),
+])
+def test_parse_webserver(body, expected):
+    assert core._parse_webserver(body) == expected
+
+
+def test_list(camera):
+    assert camera.ISOs == ["100", "200", "400"]
+
+
+def test_read_all_batches(camera, utility):
+    assert camera.read_all(["ISO", "Aperture"]) == {"ISO": "100", "Aperture": "5.6"}
+    assert utility.calls == [["get iso", "get aperture"]]
+
+
+def test_capture_with_repeated_file_name(camera):
+    start = time.monotonic()
+    assert camera.capture() == "C:\\images\\shot.jpg"
+    assert camera.capture() == "C:\\images\\shot.jpg"
+    # The counter tells the shots apart, so neither waits for capture_timeout
+    assert time.monotonic() - start < 1
+
+
+def test_transfer_unreadable(camera):
+    assert camera.Transfer is None
+
+
+def test_expose_rejected_setting(camera, utility):
+    del utility.values["iso"]
+    with pytest.raises(core.SettingsError) as info:
+        camera.expose(ISO="200", Aperture="8")
+    assert info.value.failed == ["ISO"]
+    assert info.value.last_captured == "C:\\images\\shot.jpg"
+    assert utility.values["aperture"] == "8"